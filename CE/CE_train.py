@@ -1,16 +1,21 @@
-import argparse
 import torch
 from torch import cuda
 import torch.nn as nn
+import torch.utils.data
 import random
 import sys
 sys.path.append('..')
 import glob
-from itertools import chain
+import inspect
 import os
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 
-from CE_opts import MarkdownHelpAction, model_opts, train_opts
+from CE_opts import build_train_parser
 import onmt
 import onmt.io
 import onmt.Models
@@ -19,11 +24,7 @@ import onmt.modules
 from onmt.Utils import use_gpu
 
 
-parser = argparse.ArgumentParser(description="CE_train", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-parser.add_argument('-md', action=MarkdownHelpAction, help='print Markdown-formatted help text and exit.')
-model_opts(parser)
-train_opts(parser)
-opt = parser.parse_args()
+opt = build_train_parser().parse_args()
 if opt.word_vec_size != -1:
     opt.src_word_vec_size = opt.word_vec_size
     opt.tgt_word_vec_size = opt.word_vec_size
@@ -45,16 +46,59 @@ if torch.cuda.is_available() and not opt.gpuid:
 
 if opt.gpuid:
     cuda.set_device(opt.gpuid[0])
+    # Cache the fastest cuDNN algorithm per input shape, and allow TF32
+    # tensor cores for matmuls and convolutions on Ampere and newer.
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cudnn.allow_tf32 = True
+    if hasattr(torch.backends.cuda, 'matmul'):
+        torch.backends.cuda.matmul.allow_tf32 = True
     if opt.seed > 0:
         torch.cuda.manual_seed(opt.seed)
+    # Side stream for host-to-device batch copies, shared by all iterators.
+    memcpy_stream = torch.cuda.Stream()
 
 if len(opt.gpuid) > 1:
     sys.stderr.write("Sorry, multigpu isn't supported yet, coming soon!\n")
     sys.exit(1)
 
 
+class AsyncLogger(object):
+    """
+    Wraps a Crayon experiment so that `add_scalar_value` returns at once:
+    the values are posted to the server by a background thread, keeping
+    the HTTP round trips out of the training loop.
+    """
+    def __init__(self, experiment):
+        self.experiment = experiment
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            name, value, wall_time = item
+            try:
+                self.experiment.add_scalar_value(name, value,
+                                                 wall_time=wall_time)
+            except Exception as e:
+                sys.stderr.write("Crayon logging failed: %s\n" % e)
+
+    def add_scalar_value(self, name, value):
+        # Stamped now: Crayon would otherwise use the time of the post.
+        self.queue.put((name, value, time.time()))
+
+    def close(self):
+        """Posts the pending values and stops the thread."""
+        self.queue.put(None)
+        self.thread.join()
+
+
 # Set up the Crayon logging server.
-if opt.exp_host != "":
+use_crayon = opt.exp_host != ""
+if use_crayon:
     from pycrayon import CrayonClient
     cc = CrayonClient(hostname=opt.exp_host)
 
@@ -62,7 +106,7 @@ if opt.exp_host != "":
     print(experiments)
     if opt.exp in experiments:
         cc.remove_experiment(opt.exp)
-    experiment = cc.create_experiment(opt.exp)
+    experiment = AsyncLogger(cc.create_experiment(opt.exp))
 
 
 def report_func(epoch, batch, num_batches,
@@ -82,13 +126,61 @@ def report_func(epoch, batch, num_batches,
         report_stats(Statistics): updated Statistics instance.
     """
     # if batch % opt.report_every == -1 % opt.report_every:
-    if report_flag:
-        report_stats.output(epoch, batch+1, num_batches, start_time)
-        if opt.exp_host:
-            report_stats.log("progress", experiment, lr)
-        report_stats = onmt.Statistics()
+    if not report_flag:
+        # Called on every batch: keep this path short.
+        return report_stats
+
+    report_stats.output(epoch, batch+1, num_batches, start_time)
+    if use_crayon:
+        report_stats.log("progress", experiment, lr)
+    return onmt.Statistics()
+
+
+def seed_worker(worker_id):
+    """
+    `worker_init_fn` of the data loading workers: seeds `random`, numpy
+    and torch in each worker from a stream of its own, derived from -seed
+    and the DataLoader's per-worker seed. The latter differs for every
+    shard and epoch (and is reproducible, being drawn from the torch
+    generator seeded with -seed), so no two workers share a stream.
+    """
+    import numpy as np
+    info = torch.utils.data.get_worker_info()
+    seq = np.random.SeedSequence([opt.seed, info.seed])
+    seed = int(seq.generate_state(1)[0])
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+class CEDatasetAdapter(torch.utils.data.IterableDataset):
+    """
+    Lets a `torch.utils.data.DataLoader` run an `OrderedIterator` in its
+    worker processes. Worker i numericalizes and pads every
+    num_workers-th batch only, so that the loader's round robin over the
+    workers yields the batches in their original order.
+
+    Args:
+        ordered_iter (onmt.io.OrderedIterator): a CPU iterator.
+    """
+    def __init__(self, ordered_iter):
+        self.ordered_iter = ordered_iter
 
-    return report_stats
+    def __iter__(self):
+        info = torch.utils.data.get_worker_info()
+        if info is not None:
+            # All workers share the shuffler state of the iterator they
+            # were forked with, so their batch orders agree.
+            self.ordered_iter.shard = (info.id, info.num_workers)
+        for batch in self.ordered_iter:
+            # Batches are pickled back to the main process: drop the
+            # reference to the whole dataset, and the `dict_keys`.
+            batch.dataset = None
+            batch.fields = list(batch.fields)
+            yield batch
+
+    def __len__(self):
+        return len(self.ordered_iter)
 
 
 class DatasetIter(object):
@@ -102,15 +194,22 @@ class DatasetIter(object):
         batch_size_fn: custom batch process function.
         device: the GPU device.
         is_train (bool): train or valid?
+        num_workers (int): worker processes building the batches, if any;
+            then `datasets` must be a `PrefetchShardLoader`.
     """
+    __slots__ = ('datasets', 'fields', 'batch_size', 'batch_size_fn',
+                 'device', 'is_train', 'num_workers', 'cur_iter',
+                 'cur_dataset')
+
     def __init__(self, datasets, fields, batch_size, batch_size_fn,
-                 device, is_train):
+                 device, is_train, num_workers=0):
         self.datasets = datasets
         self.fields = fields
         self.batch_size = batch_size
         self.batch_size_fn = batch_size_fn
         self.device = device
         self.is_train = is_train
+        self.num_workers = num_workers
 
         self.cur_iter = self._next_dataset_iterator(datasets)
         # We have at least one dataset.
@@ -119,7 +218,14 @@ class DatasetIter(object):
     def __iter__(self):
         dataset_iter = (d for d in self.datasets)
         while self.cur_iter is not None:
-            for batch in self.cur_iter:
+            if self.num_workers:
+                # This forks the DataLoader workers; only then may the
+                # loader thread start reading the next shard.
+                batches = iter(self.cur_iter)
+                self.datasets.workers_forked()
+            else:
+                batches = self.cur_iter
+            for batch in batches:
                 yield batch
             self.cur_iter = self._next_dataset_iterator(dataset_iter)
 
@@ -144,41 +250,243 @@ class DatasetIter(object):
 
         # Sort batch by decreasing lengths of sentence required by pytorch.
         # sort=False means "Use dataset's sortkey instead of iterator's".
-        return onmt.io.OrderedIterator(
+        ordered_iter = onmt.io.OrderedIterator(
                 dataset=self.cur_dataset, batch_size=self.batch_size,
                 batch_size_fn=self.batch_size_fn,
                 device=self.device, train=self.is_train,
                 sort=False, sort_within_batch=True,
                 repeat=False)
+        if not self.num_workers:
+            return ordered_iter
+
+        # Workers can't use CUDA, `device` must be -1 here. They must be
+        # forked: they share the iterator's shuffler state and the dataset
+        # without pickling, and spawned ones would re-run this script.
+        return torch.utils.data.DataLoader(
+                CEDatasetAdapter(ordered_iter), batch_size=None,
+                num_workers=self.num_workers,
+                worker_init_fn=seed_worker if opt.seed > 0 else None,
+                multiprocessing_context='fork')
 
 
-def load_dataset(corpus_type):
+class CudaPrefetchIter(object):
     """
-    Dataset generator. Don't do extra stuff here, like printing,
-    because they will be postponed to the first loading time.
+    Wraps a `DatasetIter` producing CPU batches, and copies each batch
+    to the GPU on `stream`, one batch ahead of the consumer.
 
     Args:
-        corpus_type: 'train' or 'valid'
-    Returns:
-        A list of dataset, the dataset(s) are lazily loaded.
+        dataset_iter (DatasetIter): iterator built with device=-1.
+        stream (torch.cuda.Stream): stream for the copies.
     """
-    assert corpus_type in ["train", "valid"]
+    __slots__ = ('dataset_iter', 'stream', 'cur_dataset')
+
+    def __init__(self, dataset_iter, stream):
+        self.dataset_iter = dataset_iter
+        self.stream = stream
+        self.cur_dataset = dataset_iter.get_cur_dataset()
+
+    def __iter__(self):
+        batches = iter(self.dataset_iter)
+        pending = self._prefetch(batches)
+        while pending is not None:
+            batch, dataset, tensors = pending
+            current = torch.cuda.current_stream()
+            current.wait_stream(self.stream)
+            for t in tensors:
+                # They were allocated on the copy stream.
+                t.record_stream(current)
+            pending = self._prefetch(batches)
+            self.cur_dataset = dataset
+            yield batch
+
+    def __len__(self):
+        return len(self.dataset_iter)
+
+    def get_cur_dataset(self):
+        return self.cur_dataset
+
+    def _prefetch(self, batches):
+        try:
+            batch = next(batches)
+        except StopIteration:
+            return None
+        # Read the dataset now: the wrapped iterator may move on to the
+        # next shard while this batch is still being consumed.
+        dataset = self.dataset_iter.get_cur_dataset()
+        tensors = []
+
+        def to_gpu(value):
+            # Fields give a tensor, a (data, lengths) tuple, or, for
+            # `PerField` and `NliField`, a list of such tuples. Like the
+            # fields do on the GPU, the lengths are moved too.
+            if torch.is_tensor(value):
+                value = value.pin_memory().cuda(non_blocking=True)
+                tensors.append(value)
+                return value
+            if isinstance(value, (list, tuple)):
+                return type(value)(to_gpu(v) for v in value)
+            return value
+
+        with torch.cuda.stream(self.stream):
+            for name in batch.fields:
+                value = getattr(batch, name, None)
+                if value is not None:
+                    setattr(batch, name, to_gpu(value))
+        return batch, dataset, tensors
+
+
+_TORCH_LOAD_PARAMS = inspect.signature(torch.load).parameters
+
+
+def torch_load(path):
+    """
+    `torch.load` onto the CPU. The tensor storages are memory-mapped
+    instead of read upfront when both this torch version (2.1+) and the
+    file's serialization format allow it.
+
+    Shards, vocabularies and checkpoints pickle torchtext objects and
+    options besides tensors, so the weights-only unpickler (the default
+    since torch 2.6) is turned off.
+    """
+    kwargs = {'map_location': lambda storage, loc: storage}
+    if 'weights_only' in _TORCH_LOAD_PARAMS:
+        kwargs['weights_only'] = False
+    if 'mmap' in _TORCH_LOAD_PARAMS and zipfile.is_zipfile(path):
+        kwargs['mmap'] = True
+    return torch.load(path, **kwargs)
+
 
-    def dataset_loader(pt_file, corpus_type):
-        dataset = torch.load(pt_file)
+class PrefetchShardLoader(object):
+    """
+    Iterates over dataset shards while a daemon thread loads the next
+    ones, so `torch.load` of a shard overlaps with training on the
+    previous one.
+
+    Args:
+        pts (list): paths of the shards to load, in order.
+        corpus_type: 'train' or 'valid'
+        depth (int): maximum number of loaded shards waiting in the queue.
+        wait_fork (bool): only start loading a shard once the consumer
+            has called `workers_forked` for the previous one.
+    """
+    def __init__(self, pts, corpus_type, depth=2, wait_fork=False):
+        self.corpus_type = corpus_type
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.wait_fork = wait_fork
+        self.forked = threading.Event()
+        self.done = False
+        self.thread = threading.Thread(target=self._produce, args=(pts,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _produce(self, pts):
+        try:
+            for i, pt in enumerate(pts):
+                if i > 0 and self.wait_fork and not self._wait_forked():
+                    return
+                if self.stopped.is_set() or not self._put(self._load(pt)):
+                    return
+        except Exception as e:
+            # Re-raised in the consumer's thread by `__next__`.
+            self._put(e)
+        # Sentinel for end-of-stream.
+        self._put(None)
+
+    def _put(self, item):
+        # Wake up regularly so that `close` never leaves us blocked
+        # on a full queue, holding a loaded shard.
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _wait_forked(self):
+        while not self.forked.wait(0.1):
+            if self.stopped.is_set():
+                return False
+        self.forked.clear()
+        return True
+
+    def _load(self, pt_file):
+        dataset = torch_load(pt_file)
         print('Loading %s dataset from %s, number of examples: %d' %
-              (corpus_type, pt_file, len(dataset)))
+              (self.corpus_type, pt_file, len(dataset)))
+        if self.corpus_type == 'train' and opt.batch_type == 'tokens':
+            # Cached for `batch_size_fn`, which runs on every example of
+            # every epoch; done here, off the training thread.
+            for ex in dataset.examples:
+                ex._maxlen = max(len(ex.tgt), len(ex.src)) + 1
+        return dataset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.done:
+            raise StopIteration
+        dataset = self.queue.get()
+        if dataset is None:
+            self.done = True
+            raise StopIteration
+        if isinstance(dataset, Exception):
+            self.done = True
+            raise dataset
         return dataset
 
+    def workers_forked(self):
+        """
+        Let the next shard load. A child forked while this thread is in
+        `torch.load` could inherit a lock that thread holds, and deadlock
+        on it; so with `wait_fork`, the consumer calls this once it has
+        forked its DataLoader workers for the shard last handed out.
+        """
+        self.forked.set()
+
+    def close(self):
+        """
+        Stop loading further shards and release the ones already queued.
+        """
+        self.stopped.set()
+        self.done = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+def shard_paths(corpus_type):
+    """
+    Args:
+        corpus_type: 'train' or 'valid'
+    Returns:
+        The paths of the dataset shard(s) of `corpus_type`, in order.
+    """
+    assert corpus_type in ["train", "valid"]
+
     # Sort the glob output by file name (by increasing indexes).
     pts = sorted(glob.glob(opt.data + '.' + corpus_type + '.[0-9]*.pt'))
-    if pts:
-        for pt in pts:
-            yield dataset_loader(pt, corpus_type)
-    else:
+    if not pts:
         # Only one onmt.io.*Dataset, simple!
-        pt = opt.data + '.' + corpus_type + '.pt'
-        yield dataset_loader(pt, corpus_type)
+        pts = [opt.data + '.' + corpus_type + '.pt']
+    return pts
+
+
+def load_dataset(corpus_type, pts=None):
+    """
+    Start loading the datasets of `corpus_type` in the background.
+
+    Args:
+        corpus_type: 'train' or 'valid'
+        pts (list): shard paths from `shard_paths`, looked up if None.
+    Returns:
+        A `PrefetchShardLoader` iterating over the dataset(s).
+    """
+    if pts is None:
+        pts = shard_paths(corpus_type)
+    return PrefetchShardLoader(pts, corpus_type,
+                               wait_fork=opt.num_workers > 0)
 
 
 def make_dataset_iter(datasets, fields, opt, is_train=True):
@@ -192,12 +500,97 @@ def make_dataset_iter(datasets, fields, opt, is_train=True):
     batch_size_fn = None
     if is_train and opt.batch_type == "tokens":
         def batch_size_fn(new, count, sofar):
-            return sofar + max(len(new.tgt), len(new.src)) + 1
+            # `_maxlen` is set by `PrefetchShardLoader`.
+            return sofar + new._maxlen
 
-    device = opt.gpuid[0] if opt.gpuid else -1
+    if not opt.gpuid:
+        return DatasetIter(datasets, fields, batch_size, batch_size_fn,
+                           -1, is_train, opt.num_workers)
 
-    return DatasetIter(datasets, fields, batch_size, batch_size_fn,
-                           device, is_train)
+    # Build the batches on the CPU; `CudaPrefetchIter` overlaps their
+    # copy to the GPU with the computation on the previous batch.
+    return CudaPrefetchIter(
+        DatasetIter(datasets, fields, batch_size, batch_size_fn,
+                    -1, is_train, opt.num_workers),
+        memcpy_stream)
+
+
+def script_generator(model):
+    """
+    Compile `model.generator` with TorchScript, in place, so that the
+    sharded loss computation doesn't pay for Python dispatch on every
+    shard. Keeps the eager module if it can't be scripted.
+    """
+    if isinstance(model.generator, torch.jit.ScriptModule):
+        return
+    try:
+        model.generator = torch.jit.script(model.generator)
+    except Exception as e:
+        print('Not scripting the generator: %s' % e)
+
+
+class AutoAccumTuner(object):
+    """
+    Grows `accum_count` while doing so makes training faster.
+
+    The throughput (examples per second) is measured over `probe`
+    accumulation windows, then `accum_count` is doubled and measured
+    again. The first doubling that doesn't gain `min_gain` is reverted
+    and tuning stops; it stops as well after `warmup` windows or once
+    `max_accum_count` is reached.
+
+    Args:
+        cuda (bool): synchronize the GPU before reading the clock.
+    """
+    def __init__(self, cuda, warmup=50, probe=5, min_gain=0.05,
+                 max_accum_count=64):
+        self.cuda = cuda
+        self.warmup = warmup
+        self.probe = probe
+        self.min_gain = min_gain
+        self.max_accum_count = max_accum_count
+        self.windows = 0
+        self.best = None
+        self.done = False
+        self._reset()
+
+    def _reset(self):
+        self.start = None
+        self.n_examples = 0
+        self.n_windows = 0
+
+    def _now(self):
+        if self.cuda:
+            torch.cuda.synchronize()
+        return time.time()
+
+    def step(self, accum_count, n_examples):
+        if self.done:
+            return accum_count
+        self.windows += 1
+        if self.start is None:
+            # Start timing from the end of this window.
+            self.start = self._now()
+            return accum_count
+        self.n_examples += n_examples
+        self.n_windows += 1
+        if self.n_windows < self.probe:
+            return accum_count
+
+        throughput = self.n_examples / (self._now() - self.start)
+        self._reset()
+        if self.best is not None and \
+                throughput < self.best * (1 + self.min_gain):
+            accum_count //= 2
+            self.done = True
+        elif self.windows >= self.warmup or \
+                accum_count * 2 > self.max_accum_count:
+            self.done = True
+        else:
+            self.best = throughput
+            return accum_count * 2
+        print('Tuned accum_count: %d' % accum_count)
+        return accum_count
 
 
 def make_loss_compute(model, tgt_vocab, opt):
@@ -206,6 +599,7 @@ def make_loss_compute(model, tgt_vocab, opt):
     compute loss in train/validate process. You can implement your
     own *LossCompute class, by subclassing LossComputeBase.
     """
+    script_generator(model)
     if opt.copy_attn:
         compute = onmt.modules.CopyGeneratorLossCompute(
             model.generator, tgt_vocab, opt.copy_attn_force)
@@ -228,21 +622,28 @@ def train_model(model, disc, nli, fields, g_optim, d_optim, nli_optim, data_type
     trunc_size = opt.truncated_decoder  # Badly named...
     shard_size = opt.max_generator_batches
 
+    accum_tuner = AutoAccumTuner(bool(opt.gpuid)) if opt.auto_accum else None
+
     trainer = onmt.Trainer(model, disc, nli, train_loss, valid_loss, g_optim, d_optim, nli_optim,
                            trunc_size, shard_size, data_type,
-                           opt.normalization, opt.accum_count)
+                           opt.normalization, opt.accum_count,
+                           accum_tuner=accum_tuner)
+
+    # The shards don't change during training, glob them once.
+    train_pts = shard_paths("train")
+    valid_pts = shard_paths("valid")
 
     for epoch in range(opt.start_epoch, opt.epochs + 1):
         print('')
 
         # 1. Train for one epoch on the training set.
-        train_datasets = load_dataset("train")
+        train_datasets = load_dataset("train", train_pts)
         train_iter = make_dataset_iter(train_datasets, fields, opt)
         train_stats = trainer.train(train_iter, epoch, report_func)
         print('Train accuracy: %g' % (100 * float(int(train_stats.n_acc)/train_stats.n_batch)))
 
         # 2. Validate on the validation set.
-        valid_iter = make_dataset_iter(load_dataset("valid"),
+        valid_iter = make_dataset_iter(load_dataset("valid", valid_pts),
                                        fields, opt,
                                        is_train=False)
 
@@ -250,7 +651,7 @@ def train_model(model, disc, nli, fields, g_optim, d_optim, nli_optim, data_type
         print('Validation accuracy: %g' % valid_stats.accuracy())
 
         # 3. Log to remote server.
-        if opt.exp_host:
+        if use_crayon:
             train_stats.log("train", experiment, g_optim.lr)
             valid_stats.log("valid", experiment, g_optim.lr)
 
@@ -265,9 +666,9 @@ def train_model(model, disc, nli, fields, g_optim, d_optim, nli_optim, data_type
 def load_fields(dataset, data_type, checkpoint):
 
     fields = onmt.io.load_fields_from_vocab(
-                torch.load(opt.data + '.vocab.pt'), data_type)
-    fields = dict([(k, f) for (k, f) in fields.items()
-                  if k in dataset.examples[0].__dict__])
+                torch_load(opt.data + '.vocab.pt'), data_type)
+    keep = dataset.examples[0].__dict__
+    fields = {k: f for k, f in fields.items() if k in keep}
     fields['per'].vocab = fields['tgt'].vocab
 
     # if checkpoint is not None:
@@ -338,48 +739,57 @@ def check_save_model_path():
 
 
 def tally_parameters(model):
-    n_params = sum([p.nelement() for p in model.parameters()])
-    print('* number of parameters: %d' % n_params)
-    enc = 0
-    dec = 0
+    n_params = enc = dec = gen = 0
     for name, param in model.named_parameters():
+        n = param.nelement()
+        n_params += n
         if 'encoder' in name:
-            enc += param.nelement()
-        elif 'decoder' or 'generator' in name:
-            dec += param.nelement()
+            enc += n
+        elif 'generator' in name:
+            gen += n
+        elif 'decoder' in name:
+            dec += n
+    print('* number of parameters: %d' % n_params)
     print('encoder: ', enc)
     print('decoder: ', dec)
+    print('generator: ', gen)
 
 
 
 def main():
+    # Read the checkpoints in the background while the data is loaded.
+    pool = ThreadPoolExecutor(max_workers=2)
+    futures = {}
+    if opt.train_from:
+        print('Loading checkpoint from %s' % opt.train_from)
+        futures['model'] = pool.submit(torch_load, opt.train_from)
+        if opt.d_train_from:
+            futures['disc'] = pool.submit(torch_load, opt.d_train_from)
+    pool.shutdown(wait=False)
+
     print("Loading train/validate datasets from '%s'" % opt.data)
-    train_datasets = load_dataset("train")
     print(' * maximum batch size: %d' % opt.batch_size)
 
     # Peek the fisrt dataset to determine the data_type.
-    # (This will load the first dataset.)
-    first_dataset = next(train_datasets)
-    train_datasets = chain([first_dataset], train_datasets)
+    # (This will load the first dataset.) `train_model` loads the
+    # shards itself, so don't read any other one here.
+    first_dataset = next(load_dataset("train", shard_paths("train")[:1]))
     data_type = first_dataset.data_type
 
-    if opt.train_from:
-        print('Loading checkpoint from %s' % opt.train_from)
-        checkpoint = torch.load(opt.train_from,
-                                map_location=lambda storage, loc: storage)
-        d_checkpoint = None
+    checkpoint = futures['model'].result() if 'model' in futures else None
+    d_checkpoint = futures['disc'].result() if 'disc' in futures else None
+    if checkpoint is not None:
         model_opt = checkpoint['opt']
         # I don't like reassigning attributes of opt: it's not clear.
         opt.start_epoch = checkpoint['epoch'] + 1
-        if opt.d_train_from:
-            d_checkpoint = torch.load(opt.d_train_from, map_location=lambda storage, loc: storage)
     else:
-        checkpoint = None
-        d_checkpoint = None
         model_opt = opt
 
     # Load fields generated from preprocess phase.
     fields = load_fields(first_dataset, data_type, checkpoint)
+    # Free the shard before building the model: `train_model` loads
+    # the shards again anyway.
+    del first_dataset
 
     # Report src/tgt features.
     collect_report_features(fields)
@@ -397,6 +807,9 @@ def main():
     # Do training.
     train_model(model, disc, nli, fields, g_optim, d_optim, nli_optim, data_type, model_opt)
 
+    if use_crayon:
+        experiment.close()
+
 
 if __name__ == '__main__':
     main()
@@ -75,6 +75,13 @@ class Optim(object):
         self.lr = lr
         self.optimizer.param_groups[0]['lr'] = self.lr
 
+    def zero_grad(self):
+        """Drop the gradients instead of filling them with zeros: this
+        saves a write over every parameter, and the next backward pass
+        allocates them again."""
+        for p in self.params:
+            p.grad = None
+
     def step(self):
         """Update the model parameters based on current gradients.
 
@@ -130,12 +130,15 @@ class Trainer(object):
             trunc_size(int): length of truncated back propagation through time
             shard_size(int): compute loss in shards of this size for efficiency
             data_type(string): type of the source input: [text|img|audio]
+            accum_tuner: optional object whose `step(accum_count,
+               n_examples)` is called after each accumulation window and
+               returns the `accum_count` to use next.
     """
 
     def __init__(self, model, disc, nli,
                  train_loss, valid_loss, g_optim, d_optim, nli_optim,
                  trunc_size=0, shard_size=32, data_type='text',
-                 normalization="sents", accum_count=1):
+                 normalization="sents", accum_count=1, accum_tuner=None):
         # Basic attributes.
         self.model = model
         self.disc = disc
@@ -153,8 +156,9 @@ class Trainer(object):
         self.eos_idx = self.train_loss.tgt_vocab.stoi[onmt.io.EOS_WORD]
         self.bos_idx = self.train_loss.tgt_vocab.stoi[onmt.io.BOS_WORD]
         self.normalization = normalization
+        self.accum_tuner = accum_tuner
         assert(accum_count > 0)
-        if accum_count > 1:
+        if accum_count > 1 or accum_tuner is not None:
             assert(self.trunc_size == 0), \
                 """To enable accumulated gradients,
                    you must disable target sequence truncating."""
@@ -191,9 +195,9 @@ class Trainer(object):
         def gradient_accumulation(truebatch_, total_stats_,
                                   report_stats_, nt_, step_type_):
             if self.accum_count > 1:
-                self.model.zero_grad()
-                self.disc.zero_grad()
-                self.nli.zero_grad()
+                self.g_optim.zero_grad()
+                self.d_optim.zero_grad()
+                self.nli_optim.zero_grad()
 
             # d1_acc, d2_acc = 0.0, 0.0
 
@@ -233,9 +237,9 @@ class Trainer(object):
 
                     # 2. F-prop all but generator.
                     if self.accum_count == 1:
-                        self.model.zero_grad()
-                        self.disc.zero_grad()
-                        self.nli.zero_grad()
+                        self.g_optim.zero_grad()
+                        self.d_optim.zero_grad()
+                        self.nli_optim.zero_grad()
 
                     outputs, attns, fak_tok, fak_outputs, d1, d2, n1, n2 = None, None, None, None, None, None, None, None
 
@@ -371,6 +375,17 @@ class Trainer(object):
                         total_stats.start_time, self.g_optim.lr,
                         report_stats, report_flag)
 
+                if self.accum_tuner is not None:
+                    accum_count = self.accum_tuner.step(
+                        self.accum_count,
+                        sum(b.batch_size for b in truebatch))
+                    if accum_count != self.accum_count and num_batches != -1:
+                        # The windows done so far, plus the ones left
+                        # at the new size.
+                        left = len(train_iter) - i - 1
+                        num_batches = idx + 1 + -(-left // accum_count)
+                    self.accum_count = accum_count
+
                 truebatch = []
                 accum = 0
                 normalization = 0
@@ -379,7 +394,7 @@ class Trainer(object):
         if len(truebatch) > 0:
             gradient_accumulation(
                     truebatch, total_stats,
-                    report_stats, normalization)
+                    report_stats, normalization, step_type)
             truebatch = []
 
         return total_stats
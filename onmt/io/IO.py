@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from collections import Counter, defaultdict, OrderedDict
-from itertools import count
+from itertools import count, islice
 
 import torch
 import torchtext.data
@@ -335,6 +335,10 @@ def _make_examples_nfeats_tpl(data_type, src_path, src_dir,
 
 
 class OrderedIterator(torchtext.data.Iterator):
+    # Set to (index, n_shards) to only produce every n_shards-th batch,
+    # starting at index, e.g. one share per data loading worker.
+    shard = None
+
     def create_batches(self):
         if self.train:
             self.batches = torchtext.data.pool(
@@ -346,3 +350,6 @@ class OrderedIterator(torchtext.data.Iterator):
             for b in torchtext.data.batch(self.data(), self.batch_size,
                                           self.batch_size_fn):
                 self.batches.append(sorted(b, key=self.sort_key))
+        if self.shard is not None:
+            index, n_shards = self.shard
+            self.batches = islice(self.batches, index, None, n_shards)